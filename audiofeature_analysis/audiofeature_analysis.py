@@ -8,17 +8,19 @@ with at leas the following columns:
     * audio feature columns
 
 Is itended to be used on dataframe charged using
-`data_input.data_denormalizer`.
+`data_input.data_denormalizer`. Aggregating functions also accept an
+iterable of dataframe chunks, such as `data_input.data_denormalizer_chunks`,
+to work out-of-core.
 
-This script requires that `pandas`, `numpy`, `matplotlib` and `seaborn`
-be installed within the Python environment you are running this script
+This script requires that `pandas`, `numpy`, `matplotlib`, `seaborn` and
+`scipy` be installed within the Python environment you are running this script
 in.
 
 This file is intended to be imported as a module and contains the 
 following functions:
 
     * feature_basic_statistics - returns min, max & avg of given feature
-        for specified artist
+        for specified artist, for a dataframe or its chunks
     * feature_mean_by_album_for_group - returns a bar graph with the
         average value for a given feature of each album for specified
         artist
@@ -26,6 +28,12 @@ following functions:
         probability density for a given feature for specified artist
     * feature_hist_comparaison - returns graph with two histograms with
         the probability density for a given feature for specified artists
+    * feature_partial_aggregates - returns mergeable sum, count, min
+        & max of given features by group for a dataframe chunk
+    * merge_partial_aggregates - returns the merge of two partial
+        aggregates
+    * feature_means_by_group - returns the average of given features
+        by group for a dataframe or an iterable of dataframe chunks
     * euclidian_similarity - given two vectors, calculates euclidian
         similarity
     * cosine_similarity - given two vectors, calculates cosine
@@ -33,6 +41,10 @@ following functions:
     * artist_similarity_comparaison - returns heatmap graph showing
         artist similarity given a list of features, similarity type and
         specified artists or none
+    * artist_similarity_clustered_heatmap - returns heatmap graph of
+        artist similarity with artists ordered by hierarchical
+        clustering, downsampled to tiles or restricted to top-k
+        neighbours, within a memory budget
 
 All functions returning graphs require a `images` folder under
 execution path to save the result graphs.
@@ -40,13 +52,31 @@ execution path to save the result graphs.
 
 import pandas as pd
 from matplotlib import pyplot as plt
-from functools import reduce
+from functools import reduce, partial
+from math import isqrt
+from multiprocessing import Pool
 import numpy as np
 import seaborn as sns
+from scipy.cluster.hierarchy import leaves_list, linkage
+from scipy.spatial.distance import cdist
 
 
-def feature_basic_statistics(df, feature, artist_filter=None):
-    """returns min, max & avg of given feature for specified artist"""
+def feature_basic_statistics(df, feature, artist_filter=None,
+                             processes=None):
+    """returns min, max & avg of given feature for specified artist;
+    `df` can be a dataframe or an iterable of dataframe chunks,
+    aggregated over `processes` processes if specified"""
+    if not isinstance(df, pd.DataFrame):
+        aggregates = _aggregate_chunks(
+            df, [feature], "name_artist",
+            [artist_filter] if artist_filter else None, processes)
+        if aggregates is None:
+            return (np.nan, np.nan, np.nan)
+        return (aggregates[("min", feature)].min(),
+                aggregates[("max", feature)].max(),
+                aggregates[("sum", feature)].sum()
+                / aggregates[("count", feature)].sum())
+
     if artist_filter:
         mask = df["name_artist"] == artist_filter
     else:
@@ -58,12 +88,90 @@ def feature_basic_statistics(df, feature, artist_filter=None):
     return (min, max, avg)
 
 
-def feature_mean_by_album_for_group(df, feature, artist):
+def feature_partial_aggregates(df, feature_list, group, artist_list=None):
+    """returns mergeable sum, count, min & max of given features by group
+    for a dataframe chunk; result columns are (statistic, feature)."""
+    if artist_list:
+        df = df.loc[df["name_artist"].isin(artist_list)]
+
+    stats = ["sum", "count", "min", "max"]
+    aggregates = df.groupby(group)[feature_list].agg(stats)
+    return aggregates.swaplevel(axis=1)[stats]
+
+
+def merge_partial_aggregates(partial1, partial2):
+    """returns the merge of two partial aggregates returned by
+    `feature_partial_aggregates`; `partial1` can be None"""
+    if partial1 is None:
+        return partial2
+    partials = pd.concat([partial1, partial2])
+    merge_by_column = {
+        column: "sum" if column[0] == "count" else column[0]
+        for column in partials.columns}
+    return partials.groupby(level=0).agg(merge_by_column)
+
+
+def _aggregate_chunks(chunks, feature_list, group, artist_list, processes):
+    """returns merged partial aggregates of all chunks, or None if there
+    are no chunks"""
+    aggregate = partial(feature_partial_aggregates, feature_list=feature_list,
+                        group=group, artist_list=artist_list)
+    if processes:
+        with Pool(processes) as pool:
+            return reduce(merge_partial_aggregates,
+                          pool.imap(aggregate, chunks), None)
+    return reduce(merge_partial_aggregates, map(aggregate, chunks), None)
+
+
+def feature_means_by_group(df, feature_list, group, artist_list=None,
+                           processes=None):
+    """
+    Returns the average of given features by group.
+
+    Chunk averages are computed from merged sums and counts, so they
+    are equal to the dataframe ones within float tolerance (summation
+    order differs), not bit for bit.
+
+    Parameters
+    ----------
+    df : pandas.dataframe or iterable of pandas.dataframe
+        Dataframe with data for calculations, or chunks of it (e.g. from
+        `data_input.data_denormalizer_chunks` or
+        `data_input.read_denormalized_parquet_chunks`). Requires
+        name_artist, group & feature columns
+    feature_list: list of str
+        Features list of column names to average
+    group: str
+        Column name to group by
+    artist_list: list of str, optional
+        Artists list names to filter on name_artist column (default is None)
+    processes: int, optional
+        Number of processes used to aggregate chunks; chunks are
+        aggregated in the current process if not specified (default is
+        None). Chunks are still read in the current process and sent to
+        the workers, so only the aggregation runs in parallel
+    """
+    if isinstance(df, pd.DataFrame):
+        if artist_list:
+            df = df.loc[df["name_artist"].isin(artist_list)]
+        return df[[group] + feature_list].groupby(group).mean()
+
+    aggregates = _aggregate_chunks(
+        df, feature_list, group, artist_list, processes)
+    if aggregates is None:
+        return pd.DataFrame(columns=feature_list, dtype=float,
+                            index=pd.Index([], name=group))
+    return aggregates["sum"] / aggregates["count"]
+
+
+def feature_mean_by_album_for_group(df, feature, artist, processes=None):
     """returns a bar graph with the average value for a given feature
-    of each album for specified artist"""
-    mask_artist = df["name_artist"] == artist
-    avg_by_album = df.loc[mask_artist, [
-        "name_album", feature]].groupby("name_album").mean()
+    of each album for specified artist; `df` can be a dataframe or an
+    iterable of dataframe chunks, aggregated over `processes` processes
+    if specified"""
+    avg_by_album = feature_means_by_group(
+        df, [feature], "name_album", artist_list=[artist],
+        processes=processes)
     fig, ax = plt.subplots()
     ax.bar(avg_by_album.index, reduce(
         lambda x, y: x + y, avg_by_album.values.tolist()))
@@ -140,16 +248,16 @@ def cosine_similarity(vector1, vector2):
 
 
 def artist_similarity_comparaison(df, feature_list, artist_list=None,
-                                  similarity='euclidian'):
+                                  similarity='euclidian', processes=None):
     """
     Returns heatmap graph showing artist similarity given a list of
     features, similarity type and specified artists or none.
 
     Parameters
     ----------
-    df : pandas.dataframe
-        Dataframe with data for calculations. Requires name_artist &
-        feature columns
+    df : pandas.dataframe or iterable of pandas.dataframe
+        Dataframe with data for calculations, or chunks of it. Requires
+        name_artist & feature columns
     feature_list: list of str
         Features list of column names to use as features
     artist_list: list of str, optional
@@ -157,14 +265,13 @@ def artist_similarity_comparaison(df, feature_list, artist_list=None,
     similarity : str
         Which smiliarity metric to use. Accepted values `euclidian`
         or `cosine`
+    processes: int, optional
+        Number of processes used to aggregate chunks, see
+        `feature_means_by_group` (default is None)
     """
-    if artist_list:
-        mask_artists = df["name_artist"].isin(artist_list)
-    else:
-        mask_artists = [True] * df.shape[0]
-
-    data = df.loc[mask_artists, ["name_artist"] + feature_list]
-    feature_means_by_artist = data.groupby("name_artist").mean()
+    feature_means_by_artist = feature_means_by_group(
+        df, feature_list, "name_artist", artist_list=artist_list,
+        processes=processes)
     comparaisons = {}
     for artist in feature_means_by_artist.index:
         comparaisons[artist] = []
@@ -187,3 +294,154 @@ def artist_similarity_comparaison(df, feature_list, artist_list=None,
     ax.set_title(f"Artists {similarity} similarity heatmap")
     fig.savefig("images/artists_similarity_heatmap.png")
     return fig
+
+
+def _similarity_block(vectors1, vectors2, similarity):
+    """returns similarity matrix between two sets of vectors, matching
+    `euclidian_similarity` and `cosine_similarity`"""
+    if similarity == 'euclidian':
+        similarities = cdist(vectors1, vectors2)
+        similarities += 1
+        return np.reciprocal(similarities, out=similarities)
+    similarities = cdist(vectors1, vectors2, metric='cosine')
+    return np.subtract(1, similarities, out=similarities)
+
+
+def _cluster_order(vectors, similarity, max_memory):
+    """returns vectors order given by hierarchical clustering; if its
+    condensed distance matrix exceeds `max_memory` bytes, vectors are
+    ordered by their projection on the first principal component"""
+    n = vectors.shape[0]
+    if n < 2:
+        return np.arange(n)
+    # distances and linkage internals take about 9 bytes per pair
+    if n * (n - 1) // 2 * 9 <= max_memory:
+        metric = 'euclidean' if similarity == 'euclidian' else 'cosine'
+        return leaves_list(linkage(vectors, method='average', metric=metric))
+
+    centered = vectors - vectors.mean(axis=0)
+    _, _, components = np.linalg.svd(centered, full_matrices=False)
+    return np.argsort(centered @ components[0])
+
+
+def artist_similarity_clustered_heatmap(df, feature_list, artist_list=None,
+                                        similarity='euclidian',
+                                        max_memory_mb=256, max_tiles=1000,
+                                        top_k=None, processes=None):
+    """
+    Returns heatmap graph showing artist similarity for thousands of
+    artists without building the full similarity matrix.
+
+    Artists are ordered by hierarchical clustering of their feature
+    means, so similar artists are close in the graph. Similarities are
+    computed by blocks of artists and averaged into at most
+    `max_tiles` x `max_tiles` tiles, both sized to fit in
+    `max_memory_mb`.
+
+    Parameters
+    ----------
+    df : pandas.dataframe or iterable of pandas.dataframe
+        Dataframe with data for calculations, or chunks of it. Requires
+        name_artist & feature columns
+    feature_list: list of str
+        Features list of column names to use as features
+    artist_list: list of str, optional
+        Artists list names to filter on name_artist column (default is None)
+    similarity : str
+        Which smiliarity metric to use. Accepted values `euclidian`
+        or `cosine`
+    max_memory_mb: int, optional
+        Memory budget in MB for clustering, similarity blocks and
+        tiles; matplotlib fixed rendering buffers, about 15 MB for
+        the 10 x 10 inches figure, are not included (default is 256)
+    max_tiles: int, optional
+        Maximum number of tiles per axis of the graph (default is 1000)
+    top_k: int, optional
+        If specified, only the `top_k` most similar artists of each
+        artist are shown (default is None)
+    processes: int, optional
+        Number of processes used to aggregate chunks, see
+        `feature_means_by_group` (default is None)
+    """
+    if similarity not in ('euclidian', 'cosine'):
+        print(f"Unsupported similarity metric: {similarity}")
+        print("Please, use one of the following: euclidian or cosine")
+        return None
+
+    feature_means_by_artist = feature_means_by_group(
+        df, feature_list, "name_artist", artist_list=artist_list,
+        processes=processes)
+    if feature_means_by_artist.empty:
+        print("No artists to compare")
+        return None
+    max_memory = int(max_memory_mb * 2**20)
+    order = _cluster_order(
+        feature_means_by_artist.values, similarity, max_memory)
+    artists = feature_means_by_artist.index[order]
+    vectors = feature_means_by_artist.values[order]
+
+    n = len(artists)
+    # tile sums & counts, the matplotlib image copy and its resampling
+    # take about 96 bytes per tile and half of the budget at most
+    n_tiles = max(1, min(n, max_tiles, isqrt(max_memory // 2 // 96)))
+    tile_of = np.arange(n) * n_tiles // n
+    tile_starts = np.searchsorted(tile_of, np.arange(n_tiles))
+    tile_widths = np.diff(np.append(tile_starts, n))
+    # a similarity takes its float64 value, plus its int64 argpartition
+    # index and bool mask with top_k; a row also takes two float64 tile
+    # reductions
+    row_memory = n * (17 if top_k else 8) + n_tiles * 16
+    # feature means, their ordered copy and artist names stay alive,
+    # and an eighth of the budget is left for smaller temporaries
+    resident_memory = (feature_means_by_artist.values.nbytes
+                       + vectors.nbytes
+                       + artists.memory_usage(deep=True)
+                       + max_memory // 8)
+    block_size = max(1, (max_memory - n_tiles * n_tiles * 96
+                         - resident_memory) // row_memory)
+
+    sums = np.zeros((n_tiles, n_tiles))
+    counts = np.zeros((n_tiles, n_tiles))
+    for start in range(0, n, block_size):
+        block = _similarity_block(
+            vectors[start:start + block_size], vectors, similarity)
+        tile_rows = tile_of[start:start + block_size]
+        if top_k and n > 1:
+            rows = np.arange(block.shape[0])
+            self_similarities = block[rows, start + rows]
+            block[rows, start + rows] = -np.inf
+            k = min(top_k, n - 1)
+            neighbours = np.argpartition(
+                block, n - k, axis=1)[:, n - k:].copy()
+            block[rows, start + rows] = self_similarities
+            shown = np.zeros(block.shape, dtype=bool)
+            np.put_along_axis(shown, neighbours, True, axis=1)
+            shown[rows, start + rows] = True
+            np.copyto(block, 0, where=~shown)
+            np.add.at(counts, tile_rows,
+                      np.add.reduceat(shown, tile_starts, axis=1,
+                                      dtype=float))
+            del shown
+        else:
+            np.add.at(counts, tile_rows, tile_widths)
+        np.add.at(sums, tile_rows,
+                  np.add.reduceat(block, tile_starts, axis=1))
+        # free the block before the next one is computed
+        del block
+
+    heat_map_data = np.divide(sums, counts, out=sums, where=counts > 0)
+    heat_map_data[counts == 0] = np.nan
+
+    fig, ax = plt.subplots(figsize=(10, 10))
+    image = ax.imshow(heat_map_data, interpolation='nearest')
+    fig.colorbar(image, ax=ax, shrink=0.8)
+    if n_tiles == n and n <= 100:
+        ax.set_xticks(range(n))
+        ax.set_xticklabels(artists, rotation=90)
+        ax.set_yticks(range(n))
+        ax.set_yticklabels(artists)
+    else:
+        ax.set_xlabel(f'{n} artists in clustered order ({n_tiles} tiles)')
+    ax.set_title(f"Artists {similarity} similarity clustered heatmap")
+    fig.savefig("images/artists_similarity_clustered_heatmap.png")
+    return fig
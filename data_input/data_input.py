@@ -20,8 +20,8 @@ On charge, this module will automatically create a `data` and `imanges`
 folder under main script execution path, and look for any file in main
 execution script path named `data.zip` and move it to `data` path.
 
-This script requires that `pandas` and `matplotlib` be installed within
-the Python environment you are running this script in.
+This script requires that `pandas`, `pyarrow` and `matplotlib` be
+installed within the Python environment you are running this script in.
 
 This file is intended to be imported as a module and contains the 
 following functions:
@@ -49,19 +49,24 @@ execution path to save the result graphs.
 
 import pandas as pd
 import zipfile as zf
+import shutil
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.dataset as ds
 import numpy as np
 import time
 import matplotlib.pyplot as plt
 
 
-def data_denormalizer(data_folder):
+def data_denormalizer(data_folder, parquet_path=None):
     """
     returns a dataframe given a path to a zipped folder with csv files
     inside named `albums_norm.csv`, `artists_norm.csv` and
     `tracks_norm.csv`; dataframe has all three csv joined by
     `artist_id`, `album_id` and `track_id` fields; Capitalizes all
     artist names and Fills tracks `popularity` missing values with mean
-    value.
+    value. If `parquet_path` is specified, dataframe is also written
+    there with `write_denormalized_parquet`.
     """
     with zf.ZipFile(data_folder, 'r') as zip_f:
         zip_f.extractall("data")
@@ -74,8 +79,136 @@ def data_denormalizer(data_folder):
 
     null_count = tracks_norm_df["popularity"].isna().sum()
     avg_popularity = tracks_norm_df["popularity"].mean()
-    tracks_norm_df["popularity"].replace(np.nan, avg_popularity,
-                                         inplace=True)
+    denorm_tracks = _denormalize_tracks(
+        tracks_norm_df, artists_norm_df, albums_norm_df, avg_popularity)
+
+    print(f"nº of tracks: {denorm_tracks.shape[0]}")
+    print(f"nº of columns: {denorm_tracks.shape[1]}")
+    print(f"nº of tracks lacking popularity value: {null_count}")
+    if parquet_path:
+        write_denormalized_parquet(denorm_tracks, parquet_path)
+    return denorm_tracks
+
+
+def write_denormalized_parquet(df, path, row_group_size=10000):
+    """
+    Writes a denormalized dataframe as a parquet dataset partitioned by
+    `release_year` decade (`release_decade=1990/` folders).
+
+    Rows are sorted by `name_artist` so each row group keeps a narrow
+    `name_artist` min/max statistic, letting artist filters skip row
+    groups. A previous dataset on `path` is removed before writing, so
+    it is fully replaced; raises ValueError if `path` holds anything
+    other than `release_decade=*` partition folders.
+
+    Parameters
+    ----------
+    df : pandas.dataframe
+        Dataframe returned by `data_denormalizer`
+    path : str
+        Folder where the dataset is written
+    row_group_size : int, optional
+        Maximum number of rows per row group (default is 10000)
+    """
+    df = df.assign(release_decade=df["release_year"] // 10 * 10)
+    table = pa.Table.from_pandas(
+        df.sort_values(["release_decade", "name_artist"]),
+        preserve_index=False)
+    dataset_folder = Path(path)
+    if dataset_folder.exists():
+        unexpected = [child.name for child in dataset_folder.iterdir()
+                      if not (child.is_dir()
+                              and child.name.startswith("release_decade="))]
+        if unexpected:
+            raise ValueError(
+                f"{path} is not a denormalized parquet dataset, "
+                f"found: {', '.join(sorted(unexpected))}")
+        shutil.rmtree(dataset_folder)
+    ds.write_dataset(
+        table, path, format="parquet",
+        partitioning=["release_decade"], partitioning_flavor="hive",
+        basename_template="part-{i}.parquet",
+        max_rows_per_group=row_group_size)
+
+
+def read_denormalized_parquet(path, columns=None, decades=None,
+                              artists=None):
+    """
+    Returns a dataframe reading only needed data from a parquet dataset
+    written by `write_denormalized_parquet`.
+
+    Decade filters only open matching partitions and artist filters
+    skip row groups using `name_artist` statistics.
+
+    Parameters
+    ----------
+    path : str
+        Folder of the parquet dataset
+    columns: list of str, optional
+        Columns to read; all `data_denormalizer` columns if not
+        specified (default is None)
+    decades: list of int, optional
+        Decades to read, e.g. [1990] (default is None)
+    artists: list of str, optional
+        Artists names to read (default is None)
+    """
+    filters = []
+    if decades is not None:
+        filters.append(("release_decade", "in", decades))
+    if artists is not None:
+        filters.append(("name_artist", "in", artists))
+
+    df = pd.read_parquet(path, engine="pyarrow", columns=columns,
+                         filters=filters or None)
+    if columns is None:
+        df = df.drop(columns="release_decade")
+    return df
+
+
+def read_denormalized_parquet_chunks(path, columns=None, decades=None,
+                                     artists=None, chunksize=10000):
+    """
+    Yields dataframe chunks reading only needed data from a parquet
+    dataset written by `write_denormalized_parquet`, one record batch
+    at a time; filters work as in `read_denormalized_parquet`.
+
+    Parameters
+    ----------
+    path : str
+        Folder of the parquet dataset
+    columns: list of str, optional
+        Columns to read; all `data_denormalizer` columns if not
+        specified (default is None)
+    decades: list of int, optional
+        Decades to read, e.g. [1990] (default is None)
+    artists: list of str, optional
+        Artists names to read (default is None)
+    chunksize : int, optional
+        Maximum number of tracks per chunk (default is 10000)
+    """
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    expression = None
+    if decades is not None:
+        expression = ds.field("release_decade").isin(decades)
+    if artists is not None:
+        artists_expression = ds.field("name_artist").isin(artists)
+        expression = (artists_expression if expression is None
+                      else expression & artists_expression)
+    if columns is None:
+        columns = [name for name in dataset.schema.names
+                   if name != "release_decade"]
+
+    for batch in dataset.to_batches(columns=columns, filter=expression,
+                                    batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+def _denormalize_tracks(tracks_norm_df, artists_norm_df, albums_norm_df,
+                        avg_popularity):
+    """returns tracks joined with their artist and album; fills tracks
+    `popularity` missing values with given average popularity."""
+    tracks_norm_df["popularity"] = tracks_norm_df["popularity"].replace(
+        np.nan, avg_popularity)
 
     denorm_tracks = tracks_norm_df.merge(
         artists_norm_df[["artist_id", "name",
@@ -91,13 +224,48 @@ def data_denormalizer(data_folder):
     denorm_tracks.rename(
         {"name": "name_album", "popularity": "popularity_album"},
         axis=1, inplace=True)
-
-    print(f"nº of tracks: {denorm_tracks.shape[0]}")
-    print(f"nº of columns: {denorm_tracks.shape[1]}")
-    print(f"nº of tracks lacking popularity value: {null_count}")
     return denorm_tracks
 
 
+def data_denormalizer_chunks(data_folder, chunksize=10000):
+    """
+    Yields the denormalized dataframe of `data_denormalizer` in chunks
+    of tracks, streaming `tracks_norm.csv` from the zipped folder.
+
+    Only artists and albums are kept in memory. Tracks are read twice:
+    a first pass computes the average `popularity` used to fill missing
+    values, so every chunk is equal to the matching rows of
+    `data_denormalizer`.
+
+    Parameters
+    ----------
+    data_folder : str
+        Path to a zipped folder with csv files inside named
+        `albums_norm.csv`, `artists_norm.csv` and `tracks_norm.csv`
+    chunksize : int, optional
+        Number of tracks per chunk (default is 10000)
+    """
+    with zf.ZipFile(data_folder, 'r') as zip_f:
+        with zip_f.open("albums_norm.csv") as f:
+            albums_norm_df = pd.read_csv(f, sep=";")
+        with zip_f.open("artists_norm.csv") as f:
+            artists_norm_df = pd.read_csv(f, sep=";")
+        artists_norm_df["name"] = artists_norm_df["name"].str.title()
+
+        popularity_sum, popularity_count = 0, 0
+        with zip_f.open("tracks_norm.csv") as f:
+            for chunk in pd.read_csv(f, sep=";", usecols=["popularity"],
+                                     chunksize=chunksize):
+                popularity_sum += chunk["popularity"].sum()
+                popularity_count += chunk["popularity"].count()
+        avg_popularity = popularity_sum / popularity_count
+
+        with zip_f.open("tracks_norm.csv") as f:
+            for chunk in pd.read_csv(f, sep=";", chunksize=chunksize):
+                yield _denormalize_tracks(
+                    chunk, artists_norm_df, albums_norm_df, avg_popularity)
+
+
 def get_column_pandas(path, separator, column_name):
     """returns specified column using pandas as
     charge method given column name and path to csv; requires to
@@ -4,7 +4,10 @@ This module allows the user to make a genearak analyse of the audio
 features data set charged using module `data_input`.
 
 This module accepts `pandas` dataframes. Is itended to be used on
-dataframe charged using `data_input.data_denormalizer`.
+dataframe charged using `data_input.data_denormalizer`. Counting
+functions also accept the path to a parquet dataset written by
+`data_input.write_denormalized_parquet`, reading only the partitions
+and columns they need.
 
 This script requires that `pandas`be installed within the Python
 environment you are running this script in.
@@ -33,11 +36,15 @@ following functions:
 
 import pandas as pd
 import datetime as dt
+import data_input.data_input as dsn
 
 
 def count_tracks_by_artist(df, artist):
     """returns count of tracks given dataframe and artist name;
     dataframe has to have `name_artist` and `track_id` columns"""
+    if not isinstance(df, pd.DataFrame):
+        df = dsn.read_denormalized_parquet(
+            df, columns=["name_artist", "track_id"], artists=[artist])
     mask = df["name_artist"] == artist
     return df.loc[mask, "track_id"].count()
 
@@ -46,6 +53,9 @@ def count_tracks_containing(df, pattern):
     """returns count of tracks containing given pattern on their
     name and dataframe to work on; dataframe has to have `name_track`
     and `track_id` columns."""
+    if not isinstance(df, pd.DataFrame):
+        df = dsn.read_denormalized_parquet(
+            df, columns=["name_track", "track_id"])
     mask = df["name_track"].str.contains(pattern, False)
     return df.loc[mask, "track_id"].count()
 
@@ -54,6 +64,10 @@ def count_tracks_in_album_from(df, decade_year):
     """returns count of tracks on albums published over given
     decade and dataframe; dataframe has to have `release_year`
     and `track_id` columns."""
+    if not isinstance(df, pd.DataFrame):
+        df = dsn.read_denormalized_parquet(
+            df, columns=["release_year", "track_id"],
+            decades=[y // 10 * 10 for y in (decade_year, decade_year + 9)])
     years = [decade_year + y for y in range(10)]
     mask = df["release_year"].isin(years)
     return df.loc[mask, "track_id"].count()
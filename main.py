@@ -63,4 +63,11 @@ fa.artist_similarity_comparaison(
        'acousticness', 'instrumentalness', 'liveness', 'valence', 'tempo',
        'time_signature'],
        similarity='cosine')
+print("General artists clustered similarity with 5 nearest neighbours...")
+fa.artist_similarity_clustered_heatmap(
+       df,
+       ['danceability', 'energy', 'key', 'loudness', 'mode', 'speechiness',
+       'acousticness', 'instrumentalness', 'liveness', 'valence', 'tempo',
+       'time_signature'],
+       top_k=5)
 print("Results on images/")
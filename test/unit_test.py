@@ -4,6 +4,10 @@ import data_wrangling.data_wrangling as dw
 import audiofeature_analysis.audiofeature_analysis as fa
 from matplotlib.figure import Figure
 import numpy as np
+import pandas as pd
+import tempfile
+import tracemalloc
+from unittest import mock
 
 
 class TestDataInput(unittest.TestCase):
@@ -19,6 +23,41 @@ class TestDataInput(unittest.TestCase):
         self.assertEqual(dns.data_denormalizer(
             self._zipped_path).shape, (35574, 30))
 
+    def test_data_denormalizer_chunks(self):
+        print("Starting test_data_denormalizer_chunks")
+        chunks = list(dns.data_denormalizer_chunks(
+            self._zipped_path, chunksize=10000))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(pd.concat(chunks).shape, (35574, 30))
+        self.assertEqual(
+            pd.concat(chunks)["popularity_track"].isna().sum(), 0)
+
+    def test_denormalized_parquet(self):
+        print("Starting test_denormalized_parquet")
+        with tempfile.TemporaryDirectory() as path:
+            df = dns.data_denormalizer(self._zipped_path, parquet_path=path)
+            self.assertEqual(
+                dns.read_denormalized_parquet(path).shape, df.shape)
+            self.assertEqual(
+                dns.read_denormalized_parquet(
+                    path, columns=["track_id"], decades=[1990]).shape,
+                (4638, 1))
+            self.assertEqual(
+                dns.read_denormalized_parquet(
+                    path, columns=["name_artist"], artists=["Radiohead"]
+                ).shape,
+                (159, 1))
+            dns.write_denormalized_parquet(
+                df.loc[df["release_year"] < 1990], path)
+            self.assertEqual(
+                dns.read_denormalized_parquet(path).shape, (9322, 30))
+            with open(f"{path}/important.txt", "w") as f:
+                f.write("keep")
+            with self.assertRaises(ValueError):
+                dns.write_denormalized_parquet(df, path)
+            with open(f"{path}/important.txt") as f:
+                self.assertEqual(f.read(), "keep")
+
     def test_get_column_pandas(self):
         print("Starting test_data_denormalizer")
         self.assertEqual(
@@ -75,6 +114,17 @@ class TestDataWrangling(unittest.TestCase):
             dw.count_tracks_in_album_from(self._df, 1990),
             90)
 
+    def test_count_tracks_from_parquet(self):
+        print("Starting test_count_tracks_from_parquet")
+        with tempfile.TemporaryDirectory() as path:
+            dns.write_denormalized_parquet(self._df, path)
+            self.assertEqual(
+                dw.count_tracks_in_album_from(path, 1990), 4638)
+            self.assertEqual(
+                dw.count_tracks_by_artist(path, "Radiohead"), 159)
+            self.assertEqual(
+                dw.count_tracks_containing(path, "police"), 11)
+
     def test_most_popular_track_last_n_years(self):
         print("Starting test_most_popular_track_last_n_years")
         self.assertEqual(
@@ -117,6 +167,16 @@ class TestAudiofeatureAnalysis(unittest.TestCase):
                 self._df, "energy", artist_filter="Metallica"),
             (1.0, 1.0, 1.0))
 
+    def test_feature_basic_statistics_chunks(self):
+        print("Starting test_feature_basic_statistics_chunks")
+        statistics = fa.feature_basic_statistics(
+            dns.data_denormalizer_chunks(self._zipped_path, chunksize=5000),
+            "energy", artist_filter="Metallica")
+        self.assertEqual(statistics[:2], (0.0533, 0.998))
+        self.assertAlmostEqual(statistics[2], 0.8462655384615385, places=12)
+        self.assertTrue(
+            np.isnan(fa.feature_basic_statistics([], "energy")).all())
+
     def test_feature_mean_by_album_for_group(self):
         print("Starting test_feature_mean_by_album_for_group")
         self.assertIsInstance(
@@ -138,6 +198,50 @@ class TestAudiofeatureAnalysis(unittest.TestCase):
                 self._df, "energy", "Adele", "Extremoduro"),
             Figure)
 
+    def test_merge_partial_aggregates(self):
+        print("Starting test_merge_partial_aggregates")
+        chunk = pd.DataFrame({"name_artist": ["A", "A", "B"],
+                              "energy": [0.2, 0.6, 0.5]})
+        merged = fa.merge_partial_aggregates(
+            fa.feature_partial_aggregates(
+                chunk[:2], ["energy"], "name_artist"),
+            fa.feature_partial_aggregates(
+                chunk[2:], ["energy"], "name_artist"))
+        self.assertEqual(merged.loc["A", ("count", "energy")], 2)
+        self.assertEqual(merged.loc["A", ("min", "energy")], 0.2)
+        self.assertEqual(merged.loc["A", ("max", "energy")], 0.6)
+        self.assertEqual(merged.loc["B", ("sum", "energy")], 0.5)
+
+    def test_feature_means_by_group(self):
+        print("Starting test_feature_means_by_group")
+        features = ['danceability', 'energy', 'key', 'tempo']
+        expected = fa.feature_means_by_group(
+            self._df, features, "name_artist")
+        chunked = fa.feature_means_by_group(
+            dns.data_denormalizer_chunks(self._zipped_path, chunksize=5000),
+            features, "name_artist")
+        pd.testing.assert_frame_equal(chunked, expected, rtol=1e-12)
+        parallel = fa.feature_means_by_group(
+            dns.data_denormalizer_chunks(self._zipped_path, chunksize=5000),
+            features, "name_album", artist_list=["Coldplay"], processes=2)
+        pd.testing.assert_frame_equal(
+            parallel,
+            fa.feature_means_by_group(
+                self._df, features, "name_album", artist_list=["Coldplay"]),
+            rtol=1e-12)
+        with tempfile.TemporaryDirectory() as path:
+            dns.write_denormalized_parquet(self._df, path)
+            from_parquet = fa.feature_means_by_group(
+                dns.read_denormalized_parquet_chunks(
+                    path, columns=["name_artist"] + features,
+                    chunksize=5000),
+                features, "name_artist")
+            pd.testing.assert_frame_equal(
+                from_parquet, expected, rtol=1e-12)
+        empty = fa.feature_means_by_group([], features, "name_artist")
+        self.assertEqual(empty.shape, (0, 4))
+        self.assertEqual(list(empty.columns), features)
+
     def test_euclidian_similarity(self):
         print("Starting test_euclidian_similarity")
         self.assertEqual(
@@ -181,6 +285,72 @@ class TestAudiofeatureAnalysis(unittest.TestCase):
                  'time_signature'],
                 similarity='pepino'))
 
+    def test_artist_similarity_clustered_heatmap(self):
+        print("Starting test_artist_similarity_clustered_heatmap")
+        features = ['danceability', 'energy', 'key', 'loudness', 'mode',
+                    'speechiness', 'acousticness', 'instrumentalness',
+                    'liveness', 'valence', 'tempo', 'time_signature']
+        self.assertIsInstance(
+            fa.artist_similarity_clustered_heatmap(self._df, features),
+            Figure)
+        self.assertIsInstance(
+            fa.artist_similarity_clustered_heatmap(
+                self._df, features, similarity='cosine', max_memory_mb=0.01,
+                max_tiles=20, top_k=5),
+            Figure)
+        self.assertIsNone(
+            fa.artist_similarity_clustered_heatmap(
+                self._df, features, similarity='pepino'))
+        self.assertIsInstance(
+            fa.artist_similarity_clustered_heatmap(
+                self._df, features, artist_list=["Coldplay"]),
+            Figure)
+        self.assertIsNone(
+            fa.artist_similarity_clustered_heatmap(
+                self._df, features, artist_list=["Juan Valdez"]))
+
+    def test_artist_similarity_clustered_heatmap_tiles(self):
+        print("Starting test_artist_similarity_clustered_heatmap_tiles")
+        df = pd.DataFrame({"name_artist": ["A", "B", "C", "D"],
+                           "energy": [0.0, 1.0, 3.0, 10.0]})
+        fig = fa.artist_similarity_clustered_heatmap(
+            df, ["energy"], max_tiles=1)
+        distances = np.abs(
+            df["energy"].values[:, None] - df["energy"].values[None, :])
+        self.assertAlmostEqual(
+            fig.get_axes()[0].get_images()[0].get_array()[0, 0],
+            np.mean(1 / (1 + distances)))
+        fig = fa.artist_similarity_clustered_heatmap(
+            df, ["energy"], top_k=1)
+        tiles = np.ma.filled(
+            fig.get_axes()[0].get_images()[0].get_array(), np.nan)
+        self.assertEqual(np.isnan(tiles).sum(), 8)
+        np.testing.assert_allclose(np.diag(tiles), 1.0)
+        off_diagonal = tiles[~np.eye(4, dtype=bool)]
+        np.testing.assert_allclose(
+            np.sort(off_diagonal[~np.isnan(off_diagonal)]),
+            [1 / 8, 1 / 3, 1 / 2, 1 / 2])
+
+    def test_artist_similarity_clustered_heatmap_memory(self):
+        print("Starting test_artist_similarity_clustered_heatmap_memory")
+        features = [f"feature_{i}" for i in range(12)]
+        df = pd.DataFrame(
+            np.random.default_rng(0).random((2000, 12)), columns=features)
+        df["name_artist"] = [f"artist_{i}" for i in range(2000)]
+        peaks = []
+
+        def measure_peak(*args, **kwargs):
+            peaks.append(tracemalloc.get_traced_memory()[1])
+
+        for top_k in (None, 5):
+            with mock.patch.object(Figure, "savefig", measure_peak):
+                tracemalloc.start()
+                fa.artist_similarity_clustered_heatmap(
+                    df, features, max_memory_mb=4, max_tiles=10,
+                    top_k=top_k)
+                tracemalloc.stop()
+            self.assertLess(peaks[-1], 4 * 2**20)
+
 
 if __name__ == '__main__':
     unittest.main()